@@ -0,0 +1,71 @@
+"""
+bench_db.py
+
+This module provides helpers shared by the benchmark scripts. Benchmarks never touch `EWallet.db`;
+they copy its schema into a temporary database file and fill it with generated users and transactions.
+"""
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+# The repository's database, found from this file so benchmarks can be started from any directory.
+SOURCE_DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "EWallet.db")
+
+
+def create_temp_database(users=100, transactions_per_user=0, balance=1000.0, start_date=None):
+    """
+    Creates a temporary database with the same schema as `EWallet.db`.
+
+    Args:
+        users (int): The number of users to create. Usernames are "User0", "User1", ...
+        transactions_per_user (int): The number of deposit rows to create for every user.
+        balance (float): The starting balance of every user.
+        start_date (datetime): The date of the oldest generated transaction; rows are one minute apart.
+
+    Returns:
+        str: The path of the temporary database file.
+    """
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="ewallet_bench_")
+    os.close(fd)
+    # Read-only, so a missing file is an error instead of a new empty database.
+    source = sqlite3.connect(f"file:{quote(SOURCE_DATABASE)}?mode=ro", uri=True)
+    schema = source.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    source.close()
+
+    connection = sqlite3.connect(path)
+    for (sql,) in schema:
+        connection.execute(sql)
+    connection.executemany(
+        "Insert into Users (username, password, balance) values (?, ?, ?)",
+        ((f"User{i}", f"Password{i}$", balance) for i in range(users)),
+    )
+    if start_date is None:
+        start_date = datetime.now() - timedelta(minutes=users * transactions_per_user)
+    rows = (
+        (f"User{i}", "deposit", str(start_date + timedelta(minutes=j * users + i)), 1.0)
+        for j in range(transactions_per_user)
+        for i in range(users)
+    )
+    connection.executemany("Insert into Transactions (username,type,date,amount) values (?,?,?,?)", rows)
+    connection.commit()
+    connection.close()
+    return path
+
+
+def remove_database(path):
+    """
+    Removes a temporary database together with its WAL and shared-memory files.
+
+    Args:
+        path (str): The path of the database file.
+
+    Returns:
+        None
+    """
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
@@ -0,0 +1,68 @@
+"""
+credential_validation.py
+
+Compares the throughput of the compiled `CredentialPolicy` with the original `Validate.validate_password`,
+which made four passes over the password through `Helper`. Both are run over the same generated candidates,
+and the script checks they accept exactly the same ones.
+
+Usage:
+    python -m Benchmarks.credential_validation --candidates 1000000
+"""
+import argparse
+import random
+import string
+import time
+
+from Services.credential_policy import DEFAULT_POLICY
+from Services.string_helper import Helper
+
+ALPHABET = string.ascii_letters + string.digits + "$@&-_!#"
+
+
+def helper_validate_password(password):
+    """
+    The password check as `Validate.validate_password` made it before the policy engine.
+    """
+    return (
+        len(password) >= 6 and
+        Helper.contain_lower_case(password) and
+        Helper.contain_upper_case(password) and
+        Helper.contain_number(password) and
+        Helper.contain_special(password)
+    )
+
+
+def measure(name, function, candidates):
+    started = time.perf_counter()
+    results = list(map(function, candidates))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<38}{elapsed:8.2f}s {len(candidates) / elapsed:12.0f} candidates/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark password validation throughput.")
+    parser.add_argument("--candidates", type=int, default=1000000, help="number of generated passwords")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    args = parser.parse_args()
+
+    generator = random.Random(args.seed)
+    candidates = [
+        "".join(generator.choices(ALPHABET, k=generator.randint(4, 20))) for _ in range(args.candidates)
+    ]
+    baseline = measure("Helper, four passes (bool)", helper_validate_password, candidates)
+    compiled = measure("CredentialPolicy.is_valid_password", DEFAULT_POLICY.is_valid_password, candidates)
+    reasons = measure("CredentialPolicy.check_password", DEFAULT_POLICY.check_password, candidates)
+
+    started = time.perf_counter()
+    summary = DEFAULT_POLICY.summarize_passwords(candidates)
+    print(f"{'CredentialPolicy.summarize_passwords':<38}{time.perf_counter() - started:8.2f}s")
+    agree = baseline == compiled == [not reason for reason in reasons]
+    print(f"results agree: {agree}; {summary['invalid']} of {summary['checked']} invalid")
+    for reason, count in summary.most_common():
+        if reason not in ("checked", "invalid"):
+            print(f"  {reason:<28}{count:>10}")
+
+
+if __name__ == "__main__":
+    main()
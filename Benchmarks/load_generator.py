@@ -0,0 +1,220 @@
+"""
+load_generator.py
+
+Simulates many users hitting the wallet database at once. A pool of worker processes calls
+`AccountService` directly with a configurable mix of operations, picking accounts with a Zipf
+distribution so a few popular accounts get most of the traffic.
+
+The report shows, per operation, how many calls succeeded or failed and the latency percentiles,
+followed by the write retries and lock errors counted by `Database`, and a conservation-of-money check:
+the sum of all balances at the end must equal the starting sum plus successful deposits minus
+successful withdrawals.
+
+Usage:
+    python -m Benchmarks.load_generator --processes 8 --operations 2000 \\
+        --mix signup=1,login=10,deposit=20,withdraw=20,transfer=30,history=19 --zipf 1.1
+"""
+import argparse
+import contextlib
+import itertools
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+
+from Benchmarks.bench_db import create_temp_database, remove_database
+from Model.user_model import User
+from Services.account_service import AccountService
+from Services.database import Database
+from Services.limits_service import LimitsService
+
+OPERATIONS = ("signup", "login", "deposit", "withdraw", "transfer", "history")
+DEFAULT_MIX = "signup=1,login=10,deposit=20,withdraw=20,transfer=30,history=19"
+
+
+def parse_mix(text):
+    """
+    Parses an operation mix such as "deposit=1,withdraw=2".
+
+    Args:
+        text (str): Comma separated operation=weight pairs.
+
+    Returns:
+        list: The weight of every operation in `OPERATIONS`.
+    """
+    weights = dict.fromkeys(OPERATIONS, 0.0)
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}")
+        weights[name] = float(weight)
+    if sum(weights.values()) <= 0:
+        raise ValueError("the operation mix needs at least one positive weight")
+    return [weights[name] for name in OPERATIONS]
+
+
+def zipf_cum_weights(count, exponent):
+    """
+    Returns cumulative weights of a Zipf distribution over `count` ranks, for `random.choices`.
+    """
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the value at `fraction` of a sorted list using the nearest-rank method.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_worker(arguments):
+    """
+    Runs the operations of one simulated process and returns its measurements.
+
+    Args:
+        arguments (tuple): (worker index, database path, settings dict).
+
+    Returns:
+        dict: Latencies and outcome counts per operation, moved money, and the `Database` counters.
+    """
+    index, path, settings = arguments
+    Database.configure(path=path, timeout=settings["timeout"], retries=settings["retries"])
+    Database.reset_stats()
+    if not settings["limits"]:
+        LimitsService.configure(tiers={"unlimited": ()}, default_tier="unlimited")
+    generator = random.Random(settings["seed"] * 1000 + index)
+    mix = settings["mix"]
+    cum_weights = zipf_cum_weights(settings["users"], settings["zipf"])
+    accounts = range(settings["users"])
+    result = {
+        "latencies": {name: [] for name in OPERATIONS},
+        "succeeded": dict.fromkeys(OPERATIONS, 0),
+        "failed": dict.fromkeys(OPERATIONS, 0),
+        "deposited": 0,
+        "withdrawn": 0,
+    }
+
+    def pick_user():
+        number = generator.choices(accounts, cum_weights=cum_weights)[0]
+        return User(f"User{number}", f"Password{number}$")
+
+    # AccountService reports problems with print(); keep the report readable.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for step in range(settings["operations"]):
+            operation = generator.choices(OPERATIONS, weights=mix)[0]
+            amount = generator.randint(1, 100)
+            user = pick_user()
+            started = time.perf_counter()
+            if operation == "signup":
+                ok = AccountService.create_user_account(User(f"Load{index}_{step}", f"Load{index}_{step}$"))
+            elif operation == "login":
+                ok = AccountService.handle_login(user)
+            elif operation == "deposit":
+                ok = AccountService.handle_deposit(user, amount)
+            elif operation == "withdraw":
+                ok = AccountService.handle_withdraw(user, amount)
+            elif operation == "transfer":
+                ok = AccountService.handle_transfer(user, amount, pick_user().get_username())
+            else:
+                try:
+                    AccountService.get_user_history(user, 0, 10)
+                    ok = True
+                except sqlite3.Error:
+                    ok = False
+            result["latencies"][operation].append(time.perf_counter() - started)
+            if ok:
+                result["succeeded"][operation] += 1
+                if operation == "deposit":
+                    result["deposited"] += amount
+                elif operation == "withdraw":
+                    result["withdrawn"] += amount
+            else:
+                result["failed"][operation] += 1
+    result["stats"] = Database.get_stats()
+    Database.close()
+    return result
+
+
+def total_balance(path):
+    """
+    Returns the sum of all balances in the database at `path`.
+    """
+    connection = sqlite3.connect(path)
+    total = connection.execute("SELECT coalesce(sum(balance), 0) FROM Users").fetchone()[0]
+    connection.close()
+    return total
+
+
+def print_report(results, elapsed, expected_total, final_total):
+    """
+    Prints throughput, latency percentiles, lock counters and the conservation-of-money check.
+    """
+    operations = sum(sum(len(values) for values in result["latencies"].values()) for result in results)
+    print(f"operations: {operations} in {elapsed:.2f}s ({operations / elapsed:.0f} ops/s)")
+    print(f"{'operation':<10}{'ok':>8}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in OPERATIONS:
+        latencies = sorted(value for result in results for value in result["latencies"][name])
+        if not latencies:
+            continue
+        succeeded = sum(result["succeeded"][name] for result in results)
+        failed = sum(result["failed"][name] for result in results)
+        row = [percentile(latencies, fraction) * 1000 for fraction in (0.50, 0.95, 0.99, 1.0)]
+        print(f"{name:<10}{succeeded:>8}{failed:>8}" + "".join(f"{value:>10.2f}" for value in row))
+    retries = sum(result["stats"]["retries"] for result in results)
+    lock_errors = sum(result["stats"]["lock_errors"] for result in results)
+    print(f"write retries: {retries}  lock errors: {lock_errors}")
+    status = "OK" if abs(final_total - expected_total) < 1e-6 else "MISMATCH"
+    print(f"money check: expected {expected_total:.2f}, found {final_total:.2f} -> {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive AccountService from many processes and report contention.")
+    parser.add_argument("--processes", type=int, default=8, help="number of simulated-user processes")
+    parser.add_argument("--operations", type=int, default=1000, help="operations per process")
+    parser.add_argument("--users", type=int, default=1000, help="accounts created before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight pairs, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of account popularity")
+    parser.add_argument("--timeout", type=float, default=5.0, help="SQLite busy timeout in seconds")
+    parser.add_argument("--retries", type=int, default=3, help="retries of a locked write transaction")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--limits", action="store_true", help="enforce the default velocity limits")
+    args = parser.parse_args()
+
+    settings = {
+        "operations": args.operations,
+        "users": args.users,
+        "mix": parse_mix(args.mix),
+        "zipf": args.zipf,
+        "timeout": args.timeout,
+        "retries": args.retries,
+        "seed": args.seed,
+        "limits": args.limits,
+    }
+    path = create_temp_database(args.users)
+    try:
+        # Opening the writer once switches the file to WAL mode before the workers start.
+        Database.configure(path=path)
+        with Database.write():
+            pass
+        Database.close()
+        starting_total = total_balance(path)
+
+        started = time.perf_counter()
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.map(run_worker, [(index, path, settings) for index in range(args.processes)])
+        elapsed = time.perf_counter() - started
+
+        deposited = sum(result["deposited"] for result in results)
+        withdrawn = sum(result["withdrawn"] for result in results)
+        print_report(results, elapsed, starting_total + deposited - withdrawn, total_balance(path))
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+read_scaling.py
+
+Measures how read throughput scales with the number of reader threads while a writer thread keeps
+depositing money (one deposit about every millisecond). Every read is a paginated history request, so each one runs two statements in a
+single snapshot, and pages are spread over the newest 500 rows of the user's history so most of the
+work happens inside SQLite, which releases the GIL while it steps a statement. Scaling is bounded by
+the number of CPU cores.
+
+Usage:
+    python -m Benchmarks.read_scaling
+"""
+import threading
+import time
+
+from Benchmarks.bench_db import create_temp_database, remove_database
+from Model.user_model import User
+from Services.account_service import AccountService
+from Services.database import Database
+
+USERS = 200
+TRANSACTIONS_PER_USER = 500
+READS_PER_THREAD = 2000
+WRITER_PAUSE = 0.001
+
+
+def run_readers(thread_count):
+    """
+    Runs `thread_count` reader threads and returns the number of reads per second.
+    """
+    def reader(index):
+        for i in range(READS_PER_THREAD):
+            user = User(f"User{(index * 7919 + i) % USERS}", "")
+            AccountService.get_user_history(user, page=(i * 31) % 50, page_size=10)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(thread_count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return thread_count * READS_PER_THREAD / (time.perf_counter() - started)
+
+
+def main():
+    path = create_temp_database(USERS, TRANSACTIONS_PER_USER)
+    stop = threading.Event()
+    writes = [0]
+
+    def writer():
+        user = User("User0", "")
+        while not stop.is_set():
+            AccountService.handle_deposit(user, 1.0)
+            writes[0] += 1
+            time.sleep(WRITER_PAUSE)
+
+    try:
+        for thread_count in (1, 2, 4, 8):
+            Database.configure(path=path, readers=thread_count)
+            stop.clear()
+            writes[0] = 0
+            writer_thread = threading.Thread(target=writer)
+            writer_thread.start()
+            reads_per_second = run_readers(thread_count)
+            stop.set()
+            writer_thread.join()
+            print(f"readers={thread_count:<2} reads/s={reads_per_second:10.0f} concurrent writes={writes[0]}")
+    finally:
+        Database.close()
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
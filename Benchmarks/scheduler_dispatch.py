@@ -0,0 +1,71 @@
+"""
+scheduler_dispatch.py
+
+Measures how fast `TransferScheduler` dispatches due transfers. It stores many recurring schedules
+between generated users, makes all of them due at once, and reports the time to load the heap, the
+dispatch rate, the memory held by the scheduler, and checks that a second pass executes nothing again.
+
+Usage:
+    python -m Benchmarks.scheduler_dispatch --schedules 100000
+"""
+import argparse
+import sqlite3
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from Benchmarks.bench_db import create_temp_database, remove_database
+from Services.database import Database
+from Services.limits_service import LimitsService
+from Services.scheduler_service import TransferScheduler, format_time
+
+USERS = 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dispatch rate of scheduled transfers.")
+    parser.add_argument("--schedules", type=int, default=100000, help="number of stored schedules")
+    parser.add_argument("--batch-size", type=int, default=500, help="runs executed per write transaction")
+    args = parser.parse_args()
+
+    path = create_temp_database(USERS, balance=1_000_000.0)
+    try:
+        Database.configure(path=path)
+        # Every user owns many schedules; measure dispatch, not the velocity limits.
+        LimitsService.configure(tiers={"unlimited": ()}, default_tier="unlimited")
+        now = datetime.now()
+        # Half of the schedules are due now, the other half in a day, so loading has to filter.
+        with Database.write() as connection:
+            sql = ("Insert into ScheduledTransfers (username, related_username, amount, interval_seconds, "
+                   "remaining, next_run, created) values (?, ?, ?, ?, ?, ?, ?)")
+            connection.executemany(sql, (
+                (f"User{i % USERS}", f"User{(i * 7 + 1) % USERS}", 1.0, 3600, None,
+                 format_time(now - timedelta(seconds=i % 600) + timedelta(days=i % 2)), str(now))
+                for i in range(args.schedules)
+            ))
+        due = (args.schedules + 1) // 2
+
+        scheduler = TransferScheduler(batch_size=args.batch_size, max_loaded=args.schedules)
+        tracemalloc.start()
+        started = time.perf_counter()
+        processed = scheduler.run_pending(now)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        again = scheduler.run_pending(now)
+
+        connection = sqlite3.connect(path)
+        transfers = connection.execute("SELECT count(*) FROM Transactions WHERE type = 'transfer'").fetchone()[0]
+        connection.close()
+        print(f"schedules={args.schedules} due={due} processed={processed} in {elapsed:.2f}s "
+              f"({processed / elapsed:.0f} runs/s)")
+        print(f"peak traced memory during dispatch: {peak / 1024 / 1024:.1f} MiB")
+        print(f"second pass processed={again}, transfer rows={transfers} -> "
+              f"{'OK' if again == 0 and transfers == due == processed else 'MISMATCH'}")
+    finally:
+        Database.close()
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
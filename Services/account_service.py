@@ -9,18 +9,28 @@ This module provides a class to manage user account operations such as:
 - Transferring money between accounts
 - Displaying user information
 
+Reads are executed on read-only connections and writes on the single writer connection,
+both provided by `Services.database.Database`.
+
 Dependencies:
     - account_model.Account: For managing the system's user list.
     - user_model.User: For representing individual user accounts.
+    - database.Database: For the read-only connection pool and the writer connection.
+    - archive_service.ArchiveService: For reading transactions that were moved to the archive.
+    - limits_service.LimitsService: For the velocity limits on withdrawals and transfers.
 """
-import sqlite3
+import time
 from datetime import datetime
 
+from Services.archive_service import ArchiveService
+from Services.database import Database
+from Services.limits_service import LimitsService
+
 class AccountService:
     """
-    A class that provides various operations for managing user accounts 
+    A class that provides various operations for managing user accounts
     in an electronic wallet system.
-    These operations include account creation, login authentication, 
+    These operations include account creation, login authentication,
     deposit, withdrawal, money transfer,and displaying user information.
 
     Methods:
@@ -32,6 +42,8 @@ class AccountService:
         handle_withdraw(current_user, withdraw_value): Handles withdrawal transactions for a user account.
         handle_transfer(source_account, transfer_value, dest_username): Transfers money from one user to another.
         handle_user_info(current_user): Displays the user’s username and balance.
+        get_user_history(current_user, page, page_size): Returns one page of the user's transactions, newest first.
+        handle_user_history(current_user): Displays the user's transactions, including archived ones.
     """
 
     @classmethod
@@ -46,15 +58,14 @@ class AccountService:
             bool: True if the account was created successfully, False if the username already exists.
         """
         try:
-            connection = sqlite3.connect("EWallet.db")
-            if not cls.check_account(new_user.get_username()):
+            with Database.write() as connection:
+                sql = "SELECT username FROM Users WHERE username = ?"
+                if connection.execute(sql, [new_user.get_username()]).fetchone() is not None:
+                    return False
                 sql = "Insert into Users (username, password, balance) values (?, ?, ?)"
                 data = [new_user.get_username(), new_user.get_password(), new_user.get_balance()]
                 connection.execute(sql, data)
-                connection.commit()
-                connection.close()
-                return True
-            return False
+            return True
         except Exception as e:
             print(f"Error: {e}")
             return False
@@ -71,12 +82,10 @@ class AccountService:
             bool: True if the account exists, False otherwise.
         """
         try:
-            connection = sqlite3.connect("EWallet.db")
-            sql = "SELECT username FROM Users WHERE username = ?"
-            data = [current_user]
-            row = connection.execute(sql, data).fetchone()
-            connection.commit()
-            connection.close()
+            with Database.read() as connection:
+                sql = "SELECT username FROM Users WHERE username = ?"
+                data = [current_user]
+                row = connection.execute(sql, data).fetchone()
             if row is None:
                 return False
             return True
@@ -96,12 +105,10 @@ class AccountService:
             bool: True if the username and password match, False otherwise.
         """
         try:
-            connection = sqlite3.connect("EWallet.db")
-            sql = "SELECT username, password FROM Users WHERE username = ? AND password = ?"
-            data = [current_user.get_username(), current_user.get_password()]
-            row = connection.execute(sql, data).fetchone()
-            connection.commit()
-            connection.close()
+            with Database.read() as connection:
+                sql = "SELECT username, password FROM Users WHERE username = ? AND password = ?"
+                data = [current_user.get_username(), current_user.get_password()]
+                row = connection.execute(sql, data).fetchone()
             if row is None:
                 return False
             return True
@@ -122,24 +129,19 @@ class AccountService:
             bool: True if the deposit is successful, False if an error occurs.
         """
         try:
-            connection = sqlite3.connect("EWallet.db")
-            sql = "UPDATE Users SET balance = balance + ? WHERE username = ?"
-            data = [deposit_value, current_user.get_username()]
-            connection.execute(sql, data)
-            
-            now=str(datetime.now())
-            hist_sql="Insert into Transactions (username,type,date,amount) values (?,?,?,?)"
-            hist_data=[current_user.get_username(),"deposit",now,deposit_value]
-            connection.execute(hist_sql,hist_data)
-    
-            connection.commit()
+            with Database.write() as connection:
+                sql = "UPDATE Users SET balance = balance + ? WHERE username = ?"
+                data = [deposit_value, current_user.get_username()]
+                connection.execute(sql, data)
+
+                now=str(datetime.now())
+                hist_sql="Insert into Transactions (username,type,date,amount) values (?,?,?,?)"
+                hist_data=[current_user.get_username(),"deposit",now,deposit_value]
+                connection.execute(hist_sql,hist_data)
             return True
         except Exception as e:
             print(f"Error: {e}")
-            connection.rollback()
             return False
-        finally:
-            connection.close()
 
     @staticmethod
     def check_enough_money(current_user, withdraw_value):
@@ -154,17 +156,28 @@ class AccountService:
             bool: True if the user has enough balance, False otherwise.
         """
         try:
-            connection = sqlite3.connect("EWallet.db")
-            sql = "SELECT balance FROM Users WHERE username = ?"
-            data = [current_user.get_username()]
-            balance_value = connection.execute(sql, data).fetchone()[0]
-            connection.commit()
-            connection.close()
+            with Database.read() as connection:
+                sql = "SELECT balance FROM Users WHERE username = ?"
+                data = [current_user.get_username()]
+                balance_value = connection.execute(sql, data).fetchone()[0]
             return balance_value >= withdraw_value
         except Exception as e:
             print(f"Error: {e}")
             return False
 
+    @staticmethod
+    def _withdraw_in_transaction(connection, username, withdraw_value):
+        """
+        Subtracts the amount from the user's balance inside an open write transaction.
+        The balance check and the update are one statement, so the balance can never go negative.
+
+        Returns:
+            bool: True if the balance was updated, False if the user doesn't have enough money.
+        """
+        sql = "UPDATE Users SET balance = balance - ? WHERE username = ? AND balance >= ?"
+        data = [withdraw_value, username, withdraw_value]
+        return connection.execute(sql, data).rowcount == 1
+
     @classmethod
     def handle_withdraw(cls, current_user, withdraw_value,comming_from="w"):
         """
@@ -175,36 +188,36 @@ class AccountService:
             withdraw_value (float): The amount to withdraw from the user’s account.
 
         Returns:
-            bool: True if the withdrawal is successful, False if an error occurs or if the user doesn't have enough money.
+            bool: True if the withdrawal is successful, False if an error occurs, if a velocity limit is reached
+            or if the user doesn't have enough money.
         """
+        moment = time.time()
+        reason = LimitsService.reserve(current_user.get_username(), "withdraw", withdraw_value, moment)
+        if reason is not None:
+            print(reason)
+            return False
         try:
-            connection = sqlite3.connect("EWallet.db")
-            if cls.check_enough_money(current_user, withdraw_value):
-                sql = "UPDATE Users SET balance = balance - ? WHERE username = ?"
-                data = [withdraw_value, current_user.get_username()]
-                connection.execute(sql, data)
-                
+            with Database.write() as connection:
+                withdrawn = cls._withdraw_in_transaction(connection, current_user.get_username(), withdraw_value)
+
                 #in order to not save a withdraw operation during the transfer
-                if comming_from=="w":
+                if withdrawn and comming_from=="w":
                     now=str(datetime.now())
                     hist_sql="Insert into Transactions (username,type,date,amount) values (?,?,?,?)"
                     hist_data=[current_user.get_username(),"withdraw",now,withdraw_value]
                     connection.execute(hist_sql,hist_data)
-                
-                connection.commit()
-                return True
         except Exception as e:
             print(f"Error: {e}")
-            connection.rollback()
-            return False
-        finally:
-            connection.close()
-    #transfer feha moshkla en baro7 anfz withdraw fa by7sal tanfez lel foo2 dih fa battsgl fel db.
-    #momken a7ot argument foo2 ya3deny mel kalam dah en law ana gay mel transfer sa3tha manfzsh el insertion transaction.
+            withdrawn = False
+        if not withdrawn:
+            LimitsService.release(current_user.get_username(), "withdraw", withdraw_value, moment)
+        return withdrawn
+
     @classmethod
     def handle_transfer(cls, source_account, transfer_value, dest_username):
         """
         Handles a money transfer between two user accounts.
+        The withdrawal, the deposit and the history row are written in one transaction.
 
         Parameters:
             source_account (User): The user object from whose account the money will be withdrawn.
@@ -212,34 +225,51 @@ class AccountService:
             dest_username (str): The username of the recipient user account.
 
         Returns:
-            bool: True if the transfer is successful, False if there’s an error or if the user doesn't have enough money.
+            bool: True if the transfer is successful, False if there’s an error, if a velocity limit is reached
+            or if the user doesn't have enough money.
         """
+        moment = time.time()
+        reason = LimitsService.reserve(source_account.get_username(), "transfer", transfer_value, moment)
+        if reason is not None:
+            print(reason)
+            return False
         try:
-            connection = sqlite3.connect("EWallet.db")
-            if not cls.check_account(dest_username):
-                print("There is no account with this username.")
-                return False
-            if not cls.handle_withdraw(source_account, transfer_value,"t"):
-                print("Not enough money to transfer.")
-                return False
-            
-            sql = "UPDATE Users SET balance = balance + ? WHERE username = ?"
-            data = [transfer_value, dest_username]
-            connection.execute(sql, data)
-            
-            now=str(datetime.now())
-            hist_sql="Insert into Transactions (username,type,related_username,date,amount) values (?,?,?,?,?)"
-            hist_data=[source_account.get_username(),"transfer",dest_username,now,transfer_value]
-            connection.execute(hist_sql,hist_data)
-            
-            connection.commit()
-            return True
+            with Database.write() as connection:
+                reason = cls._transfer_in_transaction(
+                    connection, source_account.get_username(), transfer_value, dest_username
+                )
         except Exception as e:
-            print(f"Error: {e}")
-            connection.rollback()
+            reason = f"Error: {e}"
+        if reason is not None:
+            print(reason)
+            LimitsService.release(source_account.get_username(), "transfer", transfer_value, moment)
             return False
-        finally:
-            connection.close()
+        return True
+
+    @classmethod
+    def _transfer_in_transaction(cls, connection, source_username, transfer_value, dest_username):
+        """
+        Moves money between two accounts and records the transfer inside an open write transaction.
+        Nothing is changed when the transfer is refused, so callers can run many transfers in one transaction.
+
+        Returns:
+            str: None if the transfer was made, otherwise the reason it was refused.
+        """
+        sql = "SELECT username FROM Users WHERE username = ?"
+        if connection.execute(sql, [dest_username]).fetchone() is None:
+            return "There is no account with this username."
+        if not cls._withdraw_in_transaction(connection, source_username, transfer_value):
+            return "Not enough money to transfer."
+
+        sql = "UPDATE Users SET balance = balance + ? WHERE username = ?"
+        data = [transfer_value, dest_username]
+        connection.execute(sql, data)
+
+        now=str(datetime.now())
+        hist_sql="Insert into Transactions (username,type,related_username,date,amount) values (?,?,?,?,?)"
+        hist_data=[source_username,"transfer",dest_username,now,transfer_value]
+        connection.execute(hist_sql,hist_data)
+        return None
 
     @staticmethod
     def handle_user_info(current_user):
@@ -253,29 +283,72 @@ class AccountService:
             None
         """
         try:
-            connection = sqlite3.connect("EWallet.db")
-            sql = "SELECT username, balance FROM Users WHERE username = ?"
-            data = [current_user.get_username()]
-            row = connection.execute(sql, data).fetchone()
-            connection.commit()
-            connection.close()
+            with Database.read() as connection:
+                sql = "SELECT username, balance FROM Users WHERE username = ?"
+                data = [current_user.get_username()]
+                row = connection.execute(sql, data).fetchone()
             print(f"{row[0]} {row[1]}")
         except Exception as e:
             print(f"Error: {e}")
 
     @staticmethod
-    def handle_user_history(current_user):
+    def get_user_history(current_user, page=0, page_size=None):
+        """
+        Returns one page of the user's transactions, newest first.
+        Pages continue from the rows in the database into the archived rows, so paging past the
+        recent transactions reaches older ones. The counts, the rows and the user's archive
+        segments are read from the same snapshot, so they always agree. Archive files are only
+        opened when the page reaches past the rows in the database.
+
+        Parameters:
+            current_user (User): The user object whose transactions will be returned.
+            page (int): The zero-based page number.
+            page_size (int): The number of rows per page, or None to return every row.
+
+        Returns:
+            tuple: (total, rows) where total is the number of transactions of the user
+            and rows is a list of Transactions rows.
+        """
+        username = current_user.get_username()
+        offset = 0 if page_size is None else page * page_size
+        with Database.read() as connection:
+            data = [username]
+            hot_total = connection.execute("Select count(*) from Transactions where username=?", data).fetchone()[0]
+            if page_size is None:
+                sql = "Select * from Transactions where username=? order by id desc"
+                rows = connection.execute(sql, data).fetchall()
+            else:
+                sql = "Select * from Transactions where username=? order by id desc limit ? offset ?"
+                rows = connection.execute(sql, data + [page_size, offset]).fetchall()
+            sql = ("Select s.path, u.row_count from ArchiveSegmentUsers u "
+                   "join ArchiveSegments s on s.id = u.segment_id where u.username=? order by s.max_id desc")
+            segments = connection.execute(sql, data).fetchall()
+
+        archive_total = sum(count for _, count in segments)
+        archive_offset = max(0, offset - hot_total)
+        archive_limit = None if page_size is None else page_size - len(rows)
+        archive_rows = []
+        if segments and archive_limit != 0:
+            archive_rows = ArchiveService.read_user_history(segments, username, archive_offset, archive_limit)
+        return hot_total + archive_total, rows + archive_rows
+
+    @classmethod
+    def handle_user_history(cls, current_user):
+        """
+        Displays every transaction of the user, including archived ones, oldest first.
+
+        Parameters:
+            current_user (User): The user object whose transactions will be displayed.
+
+        Returns:
+            None
+        """
         try:
-            connection=sqlite3.connect("EWallet.db")
-            sql="Select * from Transactions where username=?"
-            data=[current_user.get_username()]
-            rows=connection.execute(sql,data).fetchall()
-            connection.commit()
-            connection.close()
-            for row in rows:
+            _, rows = cls.get_user_history(current_user)
+            for row in reversed(rows):
                 for elem in row[1:]:
                     if elem is not None:
                         print(elem,end=" ")
                 print()
         except Exception as e:
-            print(f"Error: {e}")
\ No newline at end of file
+            print(f"Error: {e}")
@@ -7,6 +7,7 @@ for each functionality and validates user inputs using the `Validate` class from
 """
 
 from Services.account_service import AccountService
+from Services.limits_service import LimitsService
 from Model.user_model import User
 from Services.validation import Validate
 
@@ -22,6 +23,7 @@ class Main:
         """
         Starts the main application and displays the initial options to the user (Signup, Login, Exit).
         Handles incorrect user input and exits the program after 4 invalid attempts.
+        Before the first prompt, the velocity limit counters are rebuilt from recent transactions.
 
         Args:
             None
@@ -29,6 +31,10 @@ class Main:
         Returns:
             None
         """
+        try:
+            LimitsService.rebuild()
+        except Exception as e:
+            print(f"Error: {e}")
         error_choice_counter = 0
         print("------------------Hello Sir------------------------")
         while True:
@@ -0,0 +1,262 @@
+"""
+archive_service.py
+
+This module moves old rows of the `Transactions` table out of the database into compressed archive files,
+so the hot table stays small while the full history stays available.
+
+Archive layout:
+    <archive dir>/<YYYY-MM>/segment-<min id>-<max id>.jsonl.gz
+    <archive dir>/<YYYY-MM>/segment-<min id>-<max id>.idx.json
+
+Every segment holds the rows of one month from one archiving batch. Inside the `.jsonl.gz` file the rows of
+each user are stored as JSON lines in their own gzip member, so the rows of a single user can be read by
+seeking to the member and decompressing only that part. The `.idx.json` file maps every username to the
+offset, length and row count of its member.
+
+The number of archived rows of every user in every segment is also stored in the `ArchiveSegmentUsers` table,
+so the history of a user is counted without opening any archive file, and only the segments that hold rows
+of the requested page are read.
+
+Archiving always moves the oldest rows by id, so every archived id is smaller than every id left in the
+database. The rows of a batch are deleted and the new segments are registered in the `ArchiveSegments`
+and `ArchiveSegmentUsers` tables in the same short write transaction; files of a batch that was never
+registered are removed on the next run. Only one archiving process should run at a time.
+
+Usage:
+    python -m Services.archive_service --max-age-days 365
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import groupby, takewhile
+
+from Services.database import Database
+
+# Names of the month directories and segment files this service writes; nothing else is ever removed.
+MONTH_DIRECTORY = re.compile(r"\d{4}-\d{2}")
+SEGMENT_FILE = re.compile(r"segment-\d{12}-\d{12}\.(jsonl\.gz|idx\.json)(\.tmp)?")
+
+class ArchiveService:
+    """
+    A class that archives old transactions and reads them back for the history page.
+    All methods are class methods since the archive location is shared by the whole process.
+
+    Methods:
+        configure(archive_dir): Changes the directory that holds the archive segments.
+        get_archive_dir(): Returns the directory that holds the archive segments.
+        archive_transactions(max_age_days, batch_size): Moves transactions older than the given age to the archive.
+        read_user_history(segments, username, offset, limit): Returns archived rows of a user, newest first.
+    """
+
+    __archive_dir = None
+
+    @classmethod
+    def configure(cls, archive_dir=None):
+        """
+        Changes the directory that holds the archive segments.
+
+        Args:
+            archive_dir (str): The archive directory, or None to use the "Archive" directory next to the database.
+
+        Returns:
+            None
+        """
+        cls.__archive_dir = archive_dir
+
+    @classmethod
+    def get_archive_dir(cls):
+        """
+        Returns the directory that holds the archive segments.
+
+        Returns:
+            str: The configured archive directory, or the "Archive" directory next to the database.
+        """
+        if cls.__archive_dir is not None:
+            return cls.__archive_dir
+        return os.path.join(os.path.dirname(os.path.abspath(Database.get_path())), "Archive")
+
+    @classmethod
+    def archive_transactions(cls, max_age_days=365, batch_size=5000):
+        """
+        Moves every transaction older than `max_age_days` from the database into archive segments.
+        Rows are moved in batches; each batch only holds the write lock while its rows are deleted.
+
+        Args:
+            max_age_days (float): Transactions older than this number of days are archived.
+            batch_size (int): The maximum number of rows moved per batch.
+
+        Returns:
+            int: The number of archived rows.
+        """
+        cutoff = str(datetime.now() - timedelta(days=max_age_days))
+        cls.__remove_orphans()
+        cls.__register_users()
+        archived = 0
+        while True:
+            with Database.read() as connection:
+                sql = "SELECT id, username, type, related_username, date, amount FROM Transactions ORDER BY id LIMIT ?"
+                rows = connection.execute(sql, [batch_size]).fetchall()
+            batch = list(takewhile(lambda row: row[4] < cutoff, rows))
+            if not batch:
+                break
+            segments = cls.__write_segments(batch)
+
+            now = str(datetime.now())
+            with Database.write() as connection:
+                sql = "DELETE FROM Transactions WHERE id BETWEEN ? AND ?"
+                connection.execute(sql, [batch[0][0], batch[-1][0]])
+                for segment, users in segments:
+                    sql = ("Insert into ArchiveSegments (month, path, row_count, min_id, max_id, created) "
+                           "values (?,?,?,?,?,?)")
+                    segment_id = connection.execute(sql, segment + (now,)).lastrowid
+                    sql = "Insert into ArchiveSegmentUsers (segment_id, username, row_count) values (?,?,?)"
+                    connection.executemany(sql, [(segment_id, username, entry[2]) for username, entry in users.items()])
+            archived += len(batch)
+            if len(batch) < batch_size:
+                break
+        return archived
+
+    @classmethod
+    def read_user_history(cls, segments, username, offset=0, limit=None):
+        """
+        Returns archived rows of a user, newest first. Segments before `offset` are skipped by their
+        row count and reading stops once `limit` rows are found, so only the files of the page are opened.
+
+        Args:
+            segments (list): (path, row_count) of every segment holding rows of the user, as stored in
+                `ArchiveSegmentUsers`, ordered from the newest segment to the oldest. Paths are relative
+                to the archive directory.
+            username (str): The user whose rows are returned.
+            offset (int): The number of newest archived rows to skip.
+            limit (int): The maximum number of rows to return, or None to return every row.
+
+        Returns:
+            list: Transactions rows.
+        """
+        archive_dir = cls.get_archive_dir()
+        rows = []
+        for path, count in segments:
+            if limit is not None and len(rows) >= limit:
+                break
+            if offset >= count:
+                offset -= count
+                continue
+            full_path = os.path.join(archive_dir, path)
+            segment_rows = cls.__read_member(full_path, cls.__load_index(full_path)[username])[::-1]
+            end = None if limit is None else offset + limit - len(rows)
+            rows.extend(segment_rows[offset:end])
+            offset = 0
+        return rows
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def __load_index(full_path):
+        # Segments never change once written, so their indexes can be cached for the life of the process.
+        with open(full_path[:-len(".jsonl.gz")] + ".idx.json", encoding="utf-8") as file:
+            return json.load(file)["users"]
+
+    @staticmethod
+    def __read_member(full_path, entry):
+        offset, length, _ = entry
+        with open(full_path, "rb") as file:
+            file.seek(offset)
+            data = gzip.decompress(file.read(length))
+        return [tuple(json.loads(line)) for line in data.decode("utf-8").splitlines()]
+
+    @classmethod
+    def __write_segments(cls, batch):
+        """
+        Writes the rows of one batch into one segment per month.
+
+        Returns:
+            list: ((month, path, row_count, min_id, max_id), users) for every segment written, where users
+            maps every username to the [offset, length, row count] of its member.
+        """
+        archive_dir = cls.get_archive_dir()
+        segments = []
+        for month, month_rows in groupby(batch, key=lambda row: row[4][:7]):
+            month_rows = list(month_rows)
+            min_id, max_id = month_rows[0][0], month_rows[-1][0]
+            path = os.path.join(month, f"segment-{min_id:012d}-{max_id:012d}.jsonl.gz")
+            full_path = os.path.join(archive_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+            users = {}
+            with open(full_path + ".tmp", "wb") as file:
+                month_rows.sort(key=lambda row: (row[1], row[0]))
+                for username, user_rows in groupby(month_rows, key=lambda row: row[1]):
+                    lines = [json.dumps(list(row)) for row in user_rows]
+                    member = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+                    users[username] = [file.tell(), len(member), len(lines)]
+                    file.write(member)
+                file.flush()
+                os.fsync(file.fileno())
+            index_path = full_path[:-len(".jsonl.gz")] + ".idx.json"
+            with open(index_path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump({"month": month, "min_id": min_id, "max_id": max_id, "users": users}, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(full_path + ".tmp", full_path)
+            os.replace(index_path + ".tmp", index_path)
+            segments.append(((month, path, len(month_rows), min_id, max_id), users))
+        return segments
+
+    @classmethod
+    def __register_users(cls):
+        """
+        Fills `ArchiveSegmentUsers` for segments registered before the table existed, from their index files.
+        """
+        with Database.read() as connection:
+            sql = ("SELECT id, path FROM ArchiveSegments WHERE id NOT IN "
+                   "(SELECT segment_id FROM ArchiveSegmentUsers)")
+            missing = connection.execute(sql).fetchall()
+        archive_dir = cls.get_archive_dir()
+        for segment_id, path in missing:
+            users = cls.__load_index(os.path.join(archive_dir, path))
+            with Database.write() as connection:
+                sql = "Insert or ignore into ArchiveSegmentUsers (segment_id, username, row_count) values (?,?,?)"
+                connection.executemany(sql, [(segment_id, username, entry[2]) for username, entry in users.items()])
+
+    @classmethod
+    def __remove_orphans(cls):
+        """
+        Removes archive files that are not registered in `ArchiveSegments`. They are left behind when
+        archiving stops between writing a segment and committing the batch. Only files named like the
+        segments this service writes, inside month directories, are considered, so other files in the
+        archive directory are never touched.
+        """
+        archive_dir = cls.get_archive_dir()
+        if not os.path.isdir(archive_dir):
+            return
+        with Database.read() as connection:
+            registered = {row[0] for row in connection.execute("SELECT path FROM ArchiveSegments")}
+        keep = set()
+        for path in registered:
+            full_path = os.path.join(archive_dir, path)
+            keep.add(full_path)
+            keep.add(full_path[:-len(".jsonl.gz")] + ".idx.json")
+        for month in os.listdir(archive_dir):
+            directory = os.path.join(archive_dir, month)
+            if not MONTH_DIRECTORY.fullmatch(month) or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                full_path = os.path.join(directory, name)
+                if SEGMENT_FILE.fullmatch(name) and os.path.isfile(full_path) and full_path not in keep:
+                    os.remove(full_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old transactions from EWallet.db into the archive.")
+    parser.add_argument("--max-age-days", type=float, default=365, help="archive transactions older than this")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows moved per write transaction")
+    parser.add_argument("--database", default=None, help="path of the database file")
+    parser.add_argument("--archive-dir", default=None, help="directory that holds the archive segments")
+    args = parser.parse_args()
+    if args.database is not None:
+        Database.configure(path=args.database)
+    ArchiveService.configure(args.archive_dir)
+    print(f"Archived {ArchiveService.archive_transactions(args.max_age_days, args.batch_size)} transactions.")
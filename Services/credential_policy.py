@@ -0,0 +1,238 @@
+"""
+credential_policy.py
+
+This module provides the `CredentialPolicy` class, a configurable set of username and password rules compiled
+into lookup tables when the policy is created.
+
+Checking a password is a single pass over the string: `str.translate` maps every character to a code for its
+character class (lowercase, uppercase, digit, special) through a precomputed table, and the required codes
+found are collected into a set. The reasons for every possible combination of found classes and length errors
+are computed once per policy, so even a failing check is a single table lookup. Failures are reported as
+reason codes such as "password_missing_upper" rather than a single bool, and batch methods check whole
+iterables of candidates or audit the existing rows of the `Users` table.
+
+Example:
+    policy = CredentialPolicy(special_characters="$@&-_")
+    policy.check_password("abc")    # ('password_too_short', 'password_missing_upper', ...)
+    policy.is_valid_username("Ali") # True
+"""
+from collections import Counter
+from itertools import combinations
+
+from Services.database import Database
+
+# Character classes and the code `str.translate` maps each member to.
+CHARACTER_CLASSES = ("lower", "upper", "digit", "special")
+_CLASS_CODES = {"lower": "\x01", "upper": "\x02", "digit": "\x03", "special": "\x04"}
+
+REASON_DESCRIPTIONS = {
+    "username_too_short": "username is too short",
+    "username_bad_first_character": "username starts with a character that is not allowed",
+    "password_too_short": "password is too short",
+    "password_too_long": "password is too long",
+    "password_missing_lower": "password has no lowercase letter",
+    "password_missing_upper": "password has no uppercase letter",
+    "password_missing_digit": "password has no number",
+    "password_missing_special": "password has no special character",
+}
+
+class CredentialPolicy:
+    """
+    A class that holds compiled username and password rules.
+
+    Methods:
+        check_username(username): Returns the reasons the username breaks the policy.
+        check_password(password): Returns the reasons the password breaks the policy.
+        is_valid_username(username): Returns True if the username follows the policy.
+        is_valid_password(password): Returns True if the password follows the policy.
+        check_passwords(passwords): Yields the reasons of every password of an iterable.
+        summarize_passwords(passwords): Counts checked candidates and every reason among them.
+        audit_users(batch_size): Yields the stored users whose credentials break the policy.
+        describe(reason): Returns a sentence for a reason code.
+    """
+
+    def __init__(self, password_min_length=6, password_max_length=None,
+                 password_required_classes=CHARACTER_CLASSES, special_characters="$@&-",
+                 username_min_length=3, username_first_classes=("upper",)):
+        """
+        Initializes a new CredentialPolicy instance and compiles its lookup tables.
+
+        Raises:
+            ValueError: If a character class is unknown, or a special character is also a letter or digit.
+
+        Args:
+            password_min_length (int): The minimum length of a password.
+            password_max_length (int): The maximum length of a password, or None for no maximum.
+            password_required_classes (tuple): Character classes a password must contain at least once,
+                taken from "lower", "upper", "digit" and "special".
+            special_characters (str): The characters of the "special" class. They must not be letters or digits.
+            username_min_length (int): The minimum length of a username.
+            username_first_classes (tuple): Character classes allowed for the first character of a username.
+        """
+        unknown = set(password_required_classes) | set(username_first_classes)
+        unknown -= set(CHARACTER_CLASSES)
+        if unknown:
+            raise ValueError(f"unknown character classes: {', '.join(sorted(unknown))}")
+
+        members = {
+            "lower": "abcdefghijklmnopqrstuvwxyz",
+            "upper": "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+            "digit": "0123456789",
+            "special": special_characters,
+        }
+        # Every character maps to one class code, so a character can't be special and a letter or digit too.
+        overlap = set(special_characters) & set(members["lower"] + members["upper"] + members["digit"])
+        if overlap:
+            raise ValueError(f"special characters are also letters or digits: {''.join(sorted(overlap))}")
+        codes = _CLASS_CODES
+        # Characters outside every class are deleted, so only class codes (and non-ASCII characters,
+        # which never equal a code) are left after translating.
+        self.__table = {code: None for code in range(128)}
+        for name in CHARACTER_CLASSES:
+            for character in members[name]:
+                self.__table[ord(character)] = codes[name]
+
+        self.__password_min_length = password_min_length
+        self.__password_max_length = password_max_length
+        self.__required = frozenset(codes[name] for name in password_required_classes)
+        # (too short, too long, required codes found) -> reasons, for every combination.
+        self.__reasons = {}
+        for count in range(len(self.__required) + 1):
+            for found in combinations(sorted(self.__required), count):
+                missing = tuple(
+                    f"password_missing_{name}" for name in password_required_classes if codes[name] not in found
+                )
+                for too_short in (False, True):
+                    for too_long in (False, True):
+                        reasons = ("password_too_short",) * too_short + ("password_too_long",) * too_long
+                        self.__reasons[(too_short, too_long, frozenset(found))] = reasons + missing
+        self.__username_min_length = username_min_length
+        self.__username_first = frozenset(
+            character for name in username_first_classes for character in members[name]
+        )
+
+    def check_username(self, username):
+        """
+        Returns the reasons the username breaks the policy.
+
+        Args:
+            username (str): The username to check.
+
+        Returns:
+            tuple: Reason codes; empty if the username is valid.
+        """
+        reasons = ()
+        if len(username) < self.__username_min_length:
+            reasons += ("username_too_short",)
+        if not username or username[0] not in self.__username_first:
+            reasons += ("username_bad_first_character",)
+        return reasons
+
+    def check_password(self, password):
+        """
+        Returns the reasons the password breaks the policy.
+
+        Args:
+            password (str): The password to check.
+
+        Returns:
+            tuple: Reason codes; empty if the password is valid.
+        """
+        length = len(password)
+        found = self.__required.intersection(password.translate(self.__table))
+        too_short = length < self.__password_min_length
+        too_long = self.__password_max_length is not None and length > self.__password_max_length
+        if not too_short and not too_long and len(found) == len(self.__required):
+            return ()
+        return self.__reasons[(too_short, too_long, found)]
+
+    def is_valid_username(self, username):
+        """
+        Returns True if the username follows the policy.
+        """
+        return (len(username) >= self.__username_min_length and
+                bool(username) and username[0] in self.__username_first)
+
+    def is_valid_password(self, password):
+        """
+        Returns True if the password follows the policy.
+        """
+        length = len(password)
+        return (length >= self.__password_min_length and
+                (self.__password_max_length is None or length <= self.__password_max_length) and
+                self.__required <= set(password.translate(self.__table)))
+
+    def check_passwords(self, passwords):
+        """
+        Yields the reasons of every password of an iterable, in order.
+
+        Args:
+            passwords (iterable): The passwords to check.
+
+        Yields:
+            tuple: Reason codes of one password; empty if it is valid.
+        """
+        return map(self.check_password, passwords)
+
+    def summarize_passwords(self, passwords):
+        """
+        Counts the checked candidates, the invalid ones, and every reason among them.
+
+        Args:
+            passwords (iterable): The passwords to check.
+
+        Returns:
+            Counter: "checked" and "invalid" totals plus one entry per reason code.
+        """
+        summary = Counter()
+        checked = 0
+        for reasons in map(self.check_password, passwords):
+            checked += 1
+            if reasons:
+                summary["invalid"] += 1
+                summary.update(reasons)
+        summary["checked"] = checked
+        return summary
+
+    def audit_users(self, batch_size=10000):
+        """
+        Yields the users stored in the `Users` table whose username or password breaks the policy.
+        Rows are read in pages ordered by username, each in its own short read transaction, so a long
+        audit never keeps a read snapshot or a pooled connection open while the caller iterates.
+
+        Args:
+            batch_size (int): The number of rows read per page.
+
+        Yields:
+            tuple: (username, reasons) for every user that breaks the policy.
+        """
+        rows = None
+        while rows is None or len(rows) == batch_size:
+            with Database.read() as connection:
+                if rows is None:
+                    sql = "SELECT username, password FROM Users ORDER BY username LIMIT ?"
+                    rows = connection.execute(sql, [batch_size]).fetchall()
+                else:
+                    sql = "SELECT username, password FROM Users WHERE username > ? ORDER BY username LIMIT ?"
+                    rows = connection.execute(sql, [rows[-1][0], batch_size]).fetchall()
+            for username, password in rows:
+                reasons = self.check_username(username) + self.check_password(password)
+                if reasons:
+                    yield username, reasons
+
+    @staticmethod
+    def describe(reason):
+        """
+        Returns a sentence for a reason code.
+
+        Args:
+            reason (str): A reason code returned by a check.
+
+        Returns:
+            str: The description of the reason.
+        """
+        return REASON_DESCRIPTIONS.get(reason, reason)
+
+
+# The rules the application has always used.
+DEFAULT_POLICY = CredentialPolicy()
@@ -0,0 +1,341 @@
+"""
+database.py
+
+This module provides the `Database` class, which owns every SQLite connection the application uses.
+Reads and writes are routed through different connections:
+- Reads go through a small pool of read-only connections (opened with a `mode=ro` URI and `query_only`),
+  so queries never take the write lock and can run in parallel with each other and with the writer.
+- Writes go through a single dedicated writer connection guarded by a lock, so only one write
+  transaction is open at a time inside a process.
+
+A write transaction that cannot take the write lock within the busy timeout is retried a few times
+with a growing pause. Retries and lock errors that reach the caller are counted per process and can be
+read with `Database.get_stats()`.
+
+The database is switched to WAL journal mode when the writer is first opened. In WAL mode readers work
+on a snapshot of the database and are not blocked by an active writer. The writer also creates any
+table or index the services rely on that is missing from an older database file.
+
+Example:
+    with Database.read() as connection:
+        row = connection.execute("SELECT balance FROM Users WHERE username = ?", ["Alice"]).fetchone()
+
+    with Database.write() as connection:
+        connection.execute("UPDATE Users SET balance = balance + ? WHERE username = ?", [10, "Alice"])
+"""
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+
+class Database:
+    """
+    A class that manages the reader pool and the writer connection for the wallet database.
+    All methods are class methods since the connections are shared by the whole process.
+
+    Methods:
+        configure(path, readers, timeout, retries, connection_factory): Changes the database file and pool settings, closing open connections.
+        get_path(): Returns the path of the database file.
+        get_stats(): Returns the retry and lock error counters of the current process.
+        reset_stats(): Sets the retry and lock error counters back to zero.
+        read(): Context manager yielding a read-only connection inside a consistent snapshot.
+        write(): Context manager yielding the writer connection inside a write transaction.
+        close(): Closes all open connections.
+    """
+
+    __path = "EWallet.db"
+    __max_readers = 4
+    __timeout = 5.0
+    __retries = 3
+    __retry_pause = 0.01
+    __factory = sqlite3.Connection
+
+    # Statements run once when the writer is opened, so databases created before a table or index
+    # was introduced are upgraded in place.
+    __SCHEMA = (
+        # History reads filter Transactions by username; without this index each one scans the table.
+        "CREATE INDEX IF NOT EXISTS idx_transactions_username ON Transactions (username, id)",
+        # Archive segments that hold Transactions rows moved out of the database (see archive_service).
+        """CREATE TABLE IF NOT EXISTS ArchiveSegments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            month TEXT NOT NULL,
+            path TEXT NOT NULL UNIQUE,
+            row_count INTEGER NOT NULL,
+            min_id INTEGER NOT NULL,
+            max_id INTEGER NOT NULL,
+            created TEXT NOT NULL
+        )""",
+        # Archived rows of every user per segment, so history reads only the segments that hold the user's rows.
+        """CREATE TABLE IF NOT EXISTS ArchiveSegmentUsers (
+            segment_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            PRIMARY KEY (username, segment_id)
+        )""",
+        # Standing orders executed by the transfer scheduler (see scheduler_service).
+        """CREATE TABLE IF NOT EXISTS ScheduledTransfers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            related_username TEXT NOT NULL,
+            amount REAL NOT NULL,
+            interval_seconds INTEGER NOT NULL,
+            remaining INTEGER,
+            next_run TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            last_status TEXT,
+            created TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_scheduled_transfers_due ON ScheduledTransfers (active, next_run)",
+        # Velocity limit tier of every user that is not on the default tier (see limits_service).
+        """CREATE TABLE IF NOT EXISTS UserLimitTiers (
+            username TEXT NOT NULL PRIMARY KEY,
+            tier TEXT NOT NULL
+        )""",
+    )
+
+    # The locks are created once and never replaced; `_before_fork` keeps them usable in a forked child.
+    __lock = threading.Lock()
+    __writer_lock = threading.RLock()
+    __writer = None
+    __readers = None
+    __opened_readers = []
+    __stats = {"retries": 0, "lock_errors": 0}
+
+    @classmethod
+    def configure(cls, path=None, readers=None, timeout=None, retries=None, connection_factory=None):
+        """
+        Changes the database settings. Any connection opened with the old settings is closed.
+
+        Args:
+            path (str): The path of the SQLite database file.
+            readers (int): The maximum number of read-only connections in the pool.
+            timeout (float): Seconds a connection waits on a locked database before failing.
+            retries (int): How many times a write transaction is retried when the database is locked.
+            connection_factory (type): A `sqlite3.Connection` subclass used for new connections.
+
+        Returns:
+            None
+        """
+        cls.close()
+        if path is not None:
+            cls.__path = path
+        if readers is not None:
+            cls.__max_readers = max(1, int(readers))
+        if timeout is not None:
+            cls.__timeout = float(timeout)
+        if retries is not None:
+            cls.__retries = max(0, int(retries))
+        if connection_factory is not None:
+            cls.__factory = connection_factory
+
+    @classmethod
+    def get_path(cls):
+        """
+        Returns the path of the database file.
+
+        Returns:
+            str: The configured database path.
+        """
+        return cls.__path
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Returns the retry and lock error counters of the current process.
+
+        Returns:
+            dict: "retries" is the number of write transactions started again after the database was
+            locked, "lock_errors" is the number of lock errors raised to the caller.
+        """
+        with cls.__lock:
+            return dict(cls.__stats)
+
+    @classmethod
+    def reset_stats(cls):
+        """
+        Sets the retry and lock error counters back to zero.
+
+        Returns:
+            None
+        """
+        with cls.__lock:
+            cls.__stats = {"retries": 0, "lock_errors": 0}
+
+    @staticmethod
+    def __is_lock_error(error):
+        message = str(error)
+        return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+    @classmethod
+    def __count(cls, name):
+        with cls.__lock:
+            cls.__stats[name] += 1
+
+    @classmethod
+    def __begin_immediate(cls, connection):
+        for attempt in range(cls.__retries + 1):
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not cls.__is_lock_error(e) or attempt == cls.__retries:
+                    raise
+                cls.__count("retries")
+                time.sleep(cls.__retry_pause * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    @classmethod
+    def _before_fork(cls):
+        """
+        Takes both locks before the process forks, so no other thread holds them while the child is
+        created and the child never inherits a lock that nobody will release.
+        """
+        cls.__writer_lock.acquire()
+        cls.__lock.acquire()
+
+    @classmethod
+    def _after_fork_in_parent(cls):
+        """
+        Releases the locks taken by `_before_fork` in the parent process.
+        """
+        cls.__lock.release()
+        cls.__writer_lock.release()
+
+    @classmethod
+    def _after_fork_in_child(cls):
+        """
+        Drops connections inherited from the parent process. SQLite connections must not be used
+        across a fork, so a child process starts with an empty pool and a fresh writer.
+        """
+        cls.__writer = None
+        cls.__readers = None
+        cls.__opened_readers = []
+        cls.__stats = {"retries": 0, "lock_errors": 0}
+        cls.__lock.release()
+        cls.__writer_lock.release()
+
+    @classmethod
+    def __open_writer(cls):
+        connection = sqlite3.connect(
+            cls.__path, timeout=cls.__timeout, isolation_level=None, check_same_thread=False,
+            factory=cls.__factory,
+        )
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        for sql in cls.__SCHEMA:
+            connection.execute(sql)
+        return connection
+
+    @classmethod
+    def __open_reader(cls):
+        uri = f"file:{quote(os.path.abspath(cls.__path))}?mode=ro"
+        connection = sqlite3.connect(
+            uri, uri=True, timeout=cls.__timeout, isolation_level=None, check_same_thread=False,
+            factory=cls.__factory,
+        )
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+
+    @classmethod
+    def __get_writer(cls):
+        with cls.__lock:
+            if cls.__writer is None:
+                cls.__writer = cls.__open_writer()
+            return cls.__writer
+
+    @classmethod
+    def __acquire_reader(cls):
+        # The writer is opened first so the database is already in WAL mode when readers attach.
+        cls.__get_writer()
+        with cls.__lock:
+            if cls.__readers is None:
+                cls.__readers = queue.LifoQueue()
+            readers = cls.__readers
+            try:
+                return readers, readers.get_nowait()
+            except queue.Empty:
+                if len(cls.__opened_readers) < cls.__max_readers:
+                    connection = cls.__open_reader()
+                    cls.__opened_readers.append(connection)
+                    return readers, connection
+        return readers, readers.get()
+
+    @classmethod
+    @contextmanager
+    def read(cls):
+        """
+        Borrows a read-only connection from the pool. All statements executed inside the `with`
+        block see the same snapshot of the database, so multi-statement reads are consistent.
+
+        Yields:
+            sqlite3.Connection: A read-only connection with an open read transaction.
+        """
+        readers, connection = cls.__acquire_reader()
+        try:
+            connection.execute("BEGIN")
+            yield connection
+        except sqlite3.OperationalError as e:
+            if cls.__is_lock_error(e):
+                cls.__count("lock_errors")
+            raise
+        finally:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            readers.put(connection)
+
+    @classmethod
+    @contextmanager
+    def write(cls):
+        """
+        Opens a write transaction on the writer connection. The transaction is committed when the
+        `with` block ends normally and rolled back if it raises. Starting the transaction is retried
+        when another process holds the write lock.
+
+        Yields:
+            sqlite3.Connection: The writer connection with an open `BEGIN IMMEDIATE` transaction.
+        """
+        connection = cls.__get_writer()
+        with cls.__writer_lock:
+            try:
+                cls.__begin_immediate(connection)
+                try:
+                    yield connection
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+                connection.execute("COMMIT")
+            except sqlite3.OperationalError as e:
+                if cls.__is_lock_error(e):
+                    cls.__count("lock_errors")
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+
+    @classmethod
+    def close(cls):
+        """
+        Closes the writer and every pooled reader of the current process.
+
+        Returns:
+            None
+        """
+        with cls.__lock:
+            if cls.__writer is not None:
+                cls.__writer.close()
+            for connection in cls.__opened_readers:
+                connection.close()
+            cls.__writer = None
+            cls.__readers = None
+            cls.__opened_readers = []
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        before=Database._before_fork,
+        after_in_parent=Database._after_fork_in_parent,
+        after_in_child=Database._after_fork_in_child,
+    )
@@ -0,0 +1,353 @@
+"""
+limits_service.py
+
+This module enforces velocity limits such as "at most 5000 withdrawn per hour" or "at most 10 transfers per day"
+without querying the `Transactions` table on every withdrawal or transfer.
+
+Every user has, per limited operation, sliding-window counters kept in memory. A window is split into a fixed
+number of buckets with a running total, so checking a limit costs the same however many transactions the
+user made; the window is accurate to one bucket. Limits are grouped in tiers and every user is on the default
+tier unless `UserLimitTiers` says otherwise.
+
+Counters are created the first time a user is seen, from the user's transactions inside the longest window,
+and `LimitsService.rebuild()`, called by `Main.start()` when the application starts, fills them for every
+recently active user at once. At most `max_users` users are kept; the least recently active ones are evicted
+first and rebuilt from history if they come back.
+Counters live in the memory of one process, so limits are enforced per process. Transfers executed by the
+scheduler are reserved like any other transfer, so they count the same whether they are seen live or
+rebuilt from history.
+
+Example:
+    reason = LimitsService.reserve("Alice", "withdraw", 300)
+    if reason is None:
+        ...  # do the withdrawal, and call LimitsService.release(...) if it fails
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from Services.database import Database
+
+class VelocityLimit:
+    """
+    A class to represent one limit of a tier: a maximum amount and/or number of operations in a time window.
+
+    Attributes:
+        operation (str): The limited operation, "withdraw" or "transfer".
+        window_seconds (int): The length of the sliding window.
+        max_amount (float): The maximum total amount in the window, or None for no amount limit.
+        max_count (int): The maximum number of operations in the window, or None for no count limit.
+    """
+
+    __slots__ = ("operation", "window_seconds", "max_amount", "max_count")
+
+    def __init__(self, operation, window_seconds, max_amount=None, max_count=None):
+        """
+        Initializes a new VelocityLimit instance.
+
+        Args:
+            operation (str): The limited operation, "withdraw" or "transfer".
+            window_seconds (int): The length of the sliding window.
+            max_amount (float): The maximum total amount in the window, or None for no amount limit.
+            max_count (int): The maximum number of operations in the window, or None for no count limit.
+        """
+        self.operation = operation
+        self.window_seconds = window_seconds
+        self.max_amount = max_amount
+        self.max_count = max_count
+
+    def describe(self):
+        """
+        Returns the limit as a sentence for the user.
+
+        Returns:
+            str: For example "at most 5000 per 1 hour(s)".
+        """
+        hours = self.window_seconds / 3600
+        period = f"{hours:g} hour(s)" if hours < 24 else f"{hours / 24:g} day(s)"
+        parts = []
+        if self.max_amount is not None:
+            parts.append(f"at most {self.max_amount:g} per {period}")
+        if self.max_count is not None:
+            parts.append(f"at most {self.max_count} operations per {period}")
+        return " and ".join(parts)
+
+
+class SlidingWindow:
+    """
+    A bucketed sliding-window counter of operations and amounts.
+    Moving the window forward touches at most one pass over the buckets, so every call is constant time.
+    """
+
+    __slots__ = ("bucket_seconds", "counts", "amounts", "head", "total_count", "total_amount")
+
+    def __init__(self, window_seconds, buckets):
+        """
+        Initializes a new, empty SlidingWindow instance.
+
+        Args:
+            window_seconds (float): The length of the window.
+            buckets (int): The number of buckets the window is split into.
+        """
+        self.bucket_seconds = window_seconds / buckets
+        self.counts = [0] * buckets
+        self.amounts = [0.0] * buckets
+        self.head = 0
+        self.total_count = 0
+        self.total_amount = 0.0
+
+    def advance(self, now):
+        """
+        Moves the window so it ends at `now`, dropping buckets that fell out of it.
+        """
+        index = int(now // self.bucket_seconds)
+        size = len(self.counts)
+        if index <= self.head:
+            return
+        if index - self.head >= size:
+            self.counts = [0] * size
+            self.amounts = [0.0] * size
+            self.total_count = 0
+            self.total_amount = 0.0
+        else:
+            for expired in range(self.head + 1, index + 1):
+                slot = expired % size
+                self.total_count -= self.counts[slot]
+                self.total_amount -= self.amounts[slot]
+                self.counts[slot] = 0
+                self.amounts[slot] = 0.0
+        self.head = index
+
+    def add(self, moment, amount, count=1):
+        """
+        Adds `count` operations of `amount` in total at time `moment`. Negative values remove them again.
+        Operations older than the window are ignored.
+        """
+        index = int(moment // self.bucket_seconds)
+        if index > self.head:
+            self.advance(moment)
+        if self.head - index >= len(self.counts):
+            return
+        slot = index % len(self.counts)
+        self.counts[slot] += count
+        self.amounts[slot] += amount
+        self.total_count += count
+        self.total_amount += amount
+
+
+class LimitsService:
+    """
+    A class that checks and records withdrawals and transfers against per-tier velocity limits.
+    All methods are class methods since the counters are shared by the whole process.
+
+    Methods:
+        configure(tiers, default_tier, max_users, buckets): Changes the limits and drops all counters.
+        reserve(username, operation, amount, now): Checks the limits and counts the operation if it is allowed.
+        release(username, operation, amount, moment): Removes an operation counted by `reserve` that did not happen.
+        set_user_tier(username, tier): Moves a user to another tier.
+        rebuild(now): Fills the counters of every user active inside the longest window.
+    """
+
+    __tiers = {
+        "standard": (
+            VelocityLimit("withdraw", 3600, max_amount=5000),
+            VelocityLimit("transfer", 86400, max_count=10),
+        ),
+        "premium": (
+            VelocityLimit("withdraw", 3600, max_amount=50000),
+            VelocityLimit("transfer", 86400, max_count=100),
+        ),
+    }
+    __default_tier = "standard"
+    __max_users = 100000
+    __buckets = 60
+
+    __lock = threading.Lock()
+    # username -> {operation: [(limit, window), ...]}, least recently active first.
+    __users = OrderedDict()
+
+    @classmethod
+    def configure(cls, tiers=None, default_tier=None, max_users=None, buckets=None):
+        """
+        Changes the limits. All counters are dropped and rebuilt from history when next needed.
+
+        Args:
+            tiers (dict): Tier name -> sequence of VelocityLimit.
+            default_tier (str): The tier of users without an entry in `UserLimitTiers`.
+            max_users (int): The maximum number of users whose counters are kept in memory.
+            buckets (int): The number of buckets every window is split into.
+
+        Returns:
+            None
+        """
+        with cls.__lock:
+            if tiers is not None:
+                cls.__tiers = dict(tiers)
+            if default_tier is not None:
+                cls.__default_tier = default_tier
+            if max_users is not None:
+                cls.__max_users = max(1, int(max_users))
+            if buckets is not None:
+                cls.__buckets = max(1, int(buckets))
+            cls.__users = OrderedDict()
+
+    @classmethod
+    def reserve(cls, username, operation, amount, now=None):
+        """
+        Checks the user's limits for the operation and, if they allow it, counts the operation right away,
+        so concurrent operations of the same user cannot both use the last of the allowance.
+
+        Args:
+            username (str): The user performing the operation.
+            operation (str): "withdraw" or "transfer".
+            amount (float): The amount of the operation.
+            now (float): The current time as a Unix timestamp; defaults to time.time().
+
+        Returns:
+            str: None if the operation is allowed, otherwise the reason it is refused.
+        """
+        now = time.time() if now is None else now
+        state = cls.__get_state(username, now)
+        with cls.__lock:
+            limits = state.get(operation, ())
+            for limit, window in limits:
+                window.advance(now)
+                if limit.max_amount is not None and window.total_amount + amount > limit.max_amount + 1e-9:
+                    return f"{operation.capitalize()} limit reached: {limit.describe()}."
+                if limit.max_count is not None and window.total_count + 1 > limit.max_count:
+                    return f"{operation.capitalize()} limit reached: {limit.describe()}."
+            for _, window in limits:
+                window.add(now, amount)
+        return None
+
+    @classmethod
+    def release(cls, username, operation, amount, moment):
+        """
+        Removes an operation counted by `reserve` that did not happen, for example for lack of money.
+
+        Args:
+            username (str): The user passed to `reserve`.
+            operation (str): The operation passed to `reserve`.
+            amount (float): The amount passed to `reserve`.
+            moment (float): The time passed to, or used by, `reserve`.
+
+        Returns:
+            None
+        """
+        with cls.__lock:
+            state = cls.__users.get(username)
+            if state is None:
+                return
+            for _, window in state.get(operation, ()):
+                window.add(moment, -amount, -1)
+
+    @classmethod
+    def set_user_tier(cls, username, tier):
+        """
+        Moves a user to another tier.
+
+        Args:
+            username (str): The user to move.
+            tier (str): The name of a configured tier.
+
+        Returns:
+            bool: True if the tier was saved, False if the tier is unknown or an error occurs.
+        """
+        if tier not in cls.__tiers:
+            return False
+        try:
+            with Database.write() as connection:
+                sql = "INSERT OR REPLACE INTO UserLimitTiers (username, tier) values (?, ?)"
+                connection.execute(sql, [username, tier])
+        except Exception as e:
+            print(f"Error: {e}")
+            return False
+        with cls.__lock:
+            cls.__users.pop(username, None)
+        return True
+
+    @classmethod
+    def rebuild(cls, now=None):
+        """
+        Fills the counters of every user with transactions inside the longest window. Reads the
+        newest transactions first and stops at the first one older than the window.
+
+        Args:
+            now (float): The current time as a Unix timestamp; defaults to time.time().
+
+        Returns:
+            int: The number of users whose counters were built.
+        """
+        now = time.time() if now is None else now
+        cutoff = cls.__cutoff(now)
+        events = {}
+        with Database.read() as connection:
+            tiers = dict(connection.execute("SELECT username, tier FROM UserLimitTiers"))
+            sql = "SELECT username, type, date, amount FROM Transactions ORDER BY id DESC"
+            for username, operation, date, amount in connection.execute(sql):
+                if date < cutoff:
+                    break
+                events.setdefault(username, []).append((operation, date, amount))
+        with cls.__lock:
+            cls.__users = OrderedDict()
+            for username, user_events in reversed(list(events.items())):
+                tier = tiers.get(username, cls.__default_tier)
+                cls.__store_state(username, cls.__build_state(tier, user_events, now))
+        return len(events)
+
+    @classmethod
+    def __cutoff(cls, now):
+        longest = max((limit.window_seconds for limits in cls.__tiers.values() for limit in limits), default=0)
+        return str(datetime.fromtimestamp(now - longest))
+
+    @classmethod
+    def __build_state(cls, tier, events, now):
+        state = {}
+        for limit in cls.__tiers.get(tier, cls.__tiers[cls.__default_tier]):
+            window = SlidingWindow(limit.window_seconds, cls.__buckets)
+            window.advance(now)
+            state.setdefault(limit.operation, []).append((limit, window))
+        for operation, date, amount in events:
+            moment = datetime.fromisoformat(date).timestamp()
+            for _, window in state.get(operation, ()):
+                window.add(moment, amount)
+        return state
+
+    @classmethod
+    def __store_state(cls, username, state):
+        cls.__users[username] = state
+        cls.__users.move_to_end(username)
+        while len(cls.__users) > cls.__max_users:
+            cls.__users.popitem(last=False)
+
+    @classmethod
+    def __get_state(cls, username, now):
+        """
+        Returns the counters of a user, building them from the user's recent transactions on a miss.
+        The history is read without holding the lock, so checks of other users never wait on the database.
+        """
+        with cls.__lock:
+            state = cls.__users.get(username)
+            if state is not None:
+                cls.__users.move_to_end(username)
+                return state
+        cutoff = cls.__cutoff(now)
+        events = []
+        with Database.read() as connection:
+            row = connection.execute("SELECT tier FROM UserLimitTiers WHERE username = ?", [username]).fetchone()
+            sql = "SELECT type, date, amount FROM Transactions WHERE username = ? ORDER BY id DESC"
+            for operation, date, amount in connection.execute(sql, [username]):
+                if date < cutoff:
+                    break
+                events.append((operation, date, amount))
+        tier = cls.__default_tier if row is None else row[0]
+        state = cls.__build_state(tier, events, now)
+        with cls.__lock:
+            # Another thread may have built the counters meanwhile; keep the first so no reservation is lost.
+            existing = cls.__users.get(username)
+            if existing is not None:
+                cls.__users.move_to_end(username)
+                return existing
+            cls.__store_state(username, state)
+        return state
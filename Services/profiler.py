@@ -0,0 +1,225 @@
+"""
+profiler.py
+
+This module provides the `Profiler` class behind the `--profile` option of main.py. It records a whole
+interactive session and reports where the time went:
+- The session runs under cProfile; the resulting stats are written to a pstats file.
+- The time of every menu action (deposit, withdraw, transfer, show, history) is measured, without the
+  time spent waiting for the user to type.
+- Every SQLite statement is timed, including fetching its rows, and attributed to the running action.
+
+Nothing is installed until `Profiler.start()` is called, so a normal session runs the original code
+paths with no profiling overhead.
+
+Example:
+    Profiler.start()
+    try:
+        Main.start()
+    finally:
+        print(Profiler.stop("ewallet.prof"))
+"""
+import cProfile
+import io
+import pstats
+import sqlite3
+import time
+from functools import wraps
+
+import Services.application as application
+from Services.application import Main
+from Services.database import Database
+
+class Profiler:
+    """
+    A class that profiles an application session and summarizes it per menu action.
+    All methods are class methods since one session is profiled per process.
+
+    Methods:
+        start(): Starts profiling and instruments the menu actions and the database connections.
+        stop(output_path, top): Stops profiling, writes the pstats and summary files, and returns the summary.
+        record_statement(sql, seconds, executed): Adds the time of one SQLite statement to the running action.
+    """
+
+    # Main methods that are reported as menu actions, with the name used in the summary.
+    __ACTIONS = {
+        "deposit": "deposit",
+        "withdraw": "withdraw",
+        "transfer_money": "transfer",
+        "show_user": "show",
+        "history_page": "history",
+    }
+    __OUTSIDE_ACTIONS = "(outside actions)"
+
+    __profile = None
+    __originals = {}
+    __current_action = __OUTSIDE_ACTIONS
+    __input_wait = 0.0
+    __actions = {}
+    __statements = {}
+
+    @classmethod
+    def start(cls):
+        """
+        Starts profiling: wraps the menu actions of `Main`, times user input so it can be excluded,
+        switches the database to profiled connections and enables cProfile.
+
+        Returns:
+            None
+        """
+        cls.__actions = {}
+        cls.__statements = {}
+        cls.__input_wait = 0.0
+        cls.__current_action = cls.__OUTSIDE_ACTIONS
+        for method_name, action in cls.__ACTIONS.items():
+            original = getattr(Main, method_name)
+            cls.__originals[method_name] = Main.__dict__[method_name]
+            setattr(Main, method_name, staticmethod(cls.__wrap_action(action, original)))
+        application.input = cls.__timed_input
+        Database.configure(connection_factory=ProfiledConnection)
+        cls.__profile = cProfile.Profile()
+        cls.__profile.enable()
+
+    @classmethod
+    def stop(cls, output_path, top=15):
+        """
+        Stops profiling and restores the original code paths.
+        Writes the cProfile stats to `output_path` and the readable summary next to it with a ".txt" suffix.
+
+        Args:
+            output_path (str): The path of the pstats file.
+            top (int): The number of functions and statements listed in the summary.
+
+        Returns:
+            str: The readable summary.
+        """
+        cls.__profile.disable()
+        for method_name, original in cls.__originals.items():
+            setattr(Main, method_name, original)
+        cls.__originals = {}
+        del application.input
+        Database.configure(connection_factory=sqlite3.Connection)
+
+        cls.__profile.dump_stats(output_path)
+        summary = cls.__summary(top)
+        with open(output_path + ".txt", "w", encoding="utf-8") as file:
+            file.write(summary)
+        cls.__profile = None
+        return summary
+
+    @classmethod
+    def record_statement(cls, sql, seconds, executed=True):
+        """
+        Adds the time of one SQLite statement to the running action.
+
+        Args:
+            sql (str): The statement text.
+            seconds (float): The time spent executing the statement or fetching its rows.
+            executed (bool): True when the time belongs to executing the statement, which counts as a call,
+                False when it belongs to fetching rows of a statement already counted.
+
+        Returns:
+            None
+        """
+        key = (cls.__current_action, " ".join(sql.split()))
+        entry = cls.__statements.setdefault(key, [0, 0.0])
+        entry[0] += executed
+        entry[1] += seconds
+
+    @classmethod
+    def __wrap_action(cls, action, function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            outer_action, cls.__current_action = cls.__current_action, action
+            input_wait = cls.__input_wait
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started - (cls.__input_wait - input_wait)
+                entry = cls.__actions.setdefault(action, [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                cls.__current_action = outer_action
+        return wrapper
+
+    @classmethod
+    def __timed_input(cls, prompt=""):
+        # Waiting for the user is neither application time nor interesting to cProfile.
+        cls.__profile.disable()
+        started = time.perf_counter()
+        try:
+            return input(prompt)
+        finally:
+            cls.__input_wait += time.perf_counter() - started
+            cls.__profile.enable()
+
+    @classmethod
+    def __summary(cls, top):
+        lines = ["Menu actions (time excludes waiting for input)"]
+        lines.append(f"{'action':<12}{'calls':>7}{'total ms':>12}{'mean ms':>12}")
+        for action, (count, seconds) in sorted(cls.__actions.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{action:<12}{count:>7}{seconds * 1000:>12.2f}{seconds * 1000 / count:>12.2f}")
+
+        lines.append("")
+        lines.append("SQLite statements by total time")
+        lines.append(f"{'action':<19}{'calls':>7}{'total ms':>12}{'mean ms':>12}  statement")
+        statements = sorted(cls.__statements.items(), key=lambda item: -item[1][1])[:top]
+        for (action, sql), (count, seconds) in statements:
+            lines.append(
+                f"{action:<19}{count:>7}{seconds * 1000:>12.2f}{seconds * 1000 / count:>12.2f}  {sql}"
+            )
+
+        lines.append("")
+        lines.append("Hot spots by internal time")
+        stream = io.StringIO()
+        pstats.Stats(cls.__profile, stream=stream).strip_dirs().sort_stats("tottime").print_stats(top)
+        lines.append(stream.getvalue().strip())
+        return "\n".join(lines) + "\n"
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    A cursor that reports the time of its statement, including fetching rows, to `Profiler`.
+    """
+
+    def execute(self, sql, parameters=()):
+        self.__sql = sql
+        return self.__timed(True, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.__sql = sql
+        return self.__timed(True, super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self.__timed(False, super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self.__timed(False, super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self.__timed(False, super().fetchall)
+
+    def __next__(self):
+        return self.__timed(False, super().__next__)
+
+    def __timed(self, executed, function, *args):
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            Profiler.record_statement(self.__sql, time.perf_counter() - started, executed)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    A connection whose `execute` shortcuts return a `ProfiledCursor`.
+    """
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
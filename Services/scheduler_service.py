@@ -0,0 +1,316 @@
+"""
+scheduler_service.py
+
+This module executes standing orders (rent, subscriptions, salaries) without anyone running a transfer by hand.
+
+- `SchedulerService` creates, cancels and lists scheduled transfers. They are stored in the
+  `ScheduledTransfers` table with the time of their next run.
+- `TransferScheduler` executes them. It keeps a heap of only the schedules due within the next few
+  seconds, sleeps until the earliest one is due, and executes due transfers in batches, one write
+  transaction per batch.
+
+Every execution advances `next_run` in the same transaction as the transfer itself, and only if `next_run`
+still holds the value the scheduler loaded. A run that was already executed, by this scheduler before a
+restart or by another scheduler process, therefore matches no row and is skipped: catching up after
+downtime executes every missed run once, oldest first, and never twice.
+
+Scheduled transfers count against the owner's velocity limits like any other transfer (see limits_service).
+A run refused by a limit is recorded in `last_status` and the schedule moves on to its next run.
+
+Run times are stored as "YYYY-MM-DD HH:MM:SS.ffffff" strings, so string order is time order.
+
+Usage:
+    python -m Services.scheduler_service
+"""
+import argparse
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from Services.account_service import AccountService
+from Services.database import Database
+from Services.limits_service import LimitsService
+
+def format_time(moment):
+    """
+    Formats a datetime the way run times are stored.
+
+    Args:
+        moment (datetime): The time to format.
+
+    Returns:
+        str: The time as "YYYY-MM-DD HH:MM:SS.ffffff".
+    """
+    return moment.isoformat(sep=" ", timespec="microseconds")
+
+
+class SchedulerService:
+    """
+    A class that manages the stored scheduled transfers.
+    All methods are static since they do not depend on class or instance state.
+
+    Methods:
+        create_schedule(source_account, dest_username, amount, first_run, interval_seconds, occurrences):
+            Stores a new scheduled transfer.
+        cancel_schedule(source_account, schedule_id): Stops a scheduled transfer of the user.
+        list_schedules(source_account): Returns the active scheduled transfers of the user.
+    """
+
+    @staticmethod
+    def create_schedule(source_account, dest_username, amount, first_run, interval_seconds=0, occurrences=None):
+        """
+        Stores a new scheduled transfer.
+
+        Parameters:
+            source_account (User): The user whose account pays the transfers.
+            dest_username (str): The username of the recipient user account.
+            amount (float): The amount of every transfer.
+            first_run (datetime): The time of the first transfer.
+            interval_seconds (int): The time between two transfers, or 0 for a single transfer.
+            occurrences (int): The number of transfers to make, or None to repeat until cancelled.
+
+        Returns:
+            int: The id of the new schedule, or None if the schedule is invalid or an error occurs.
+        """
+        if not isinstance(first_run, datetime):
+            print("The first run must be a date and time.")
+            return None
+        if not amount > 0:
+            print("The amount must be greater than zero.")
+            return None
+        if interval_seconds < 0:
+            print("The interval can't be negative.")
+            return None
+        if occurrences is not None and occurrences < 1:
+            print("The number of transfers must be at least one.")
+            return None
+        if dest_username == source_account.get_username():
+            print("You can't schedule a transfer to your own account.")
+            return None
+        if interval_seconds == 0:
+            occurrences = 1
+        try:
+            with Database.write() as connection:
+                sql = "SELECT username FROM Users WHERE username = ?"
+                if connection.execute(sql, [dest_username]).fetchone() is None:
+                    print("There is no account with this username.")
+                    return None
+                sql = ("Insert into ScheduledTransfers (username, related_username, amount, interval_seconds, "
+                       "remaining, next_run, created) values (?, ?, ?, ?, ?, ?, ?)")
+                data = [source_account.get_username(), dest_username, amount, int(interval_seconds),
+                        occurrences, format_time(first_run), str(datetime.now())]
+                return connection.execute(sql, data).lastrowid
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
+    @staticmethod
+    def cancel_schedule(source_account, schedule_id):
+        """
+        Stops a scheduled transfer of the user.
+
+        Parameters:
+            source_account (User): The user who owns the schedule.
+            schedule_id (int): The id of the schedule.
+
+        Returns:
+            bool: True if the schedule was cancelled, False if the user has no such active schedule.
+        """
+        try:
+            with Database.write() as connection:
+                sql = "UPDATE ScheduledTransfers SET active = 0 WHERE id = ? AND username = ? AND active = 1"
+                return connection.execute(sql, [schedule_id, source_account.get_username()]).rowcount == 1
+        except Exception as e:
+            print(f"Error: {e}")
+            return False
+
+    @staticmethod
+    def list_schedules(source_account):
+        """
+        Returns the active scheduled transfers of the user.
+
+        Parameters:
+            source_account (User): The user who owns the schedules.
+
+        Returns:
+            list: Rows of (id, related_username, amount, interval_seconds, remaining, next_run, last_status).
+        """
+        with Database.read() as connection:
+            sql = ("SELECT id, related_username, amount, interval_seconds, remaining, next_run, last_status "
+                   "FROM ScheduledTransfers WHERE username = ? AND active = 1 ORDER BY next_run")
+            return connection.execute(sql, [source_account.get_username()]).fetchall()
+
+
+class TransferScheduler:
+    """
+    Executes due scheduled transfers.
+
+    Only schedules due before the end of the look-ahead window are held in memory, at most `max_loaded`
+    of them, as a heap of (next_run, id) pairs. The heap is rebuilt from the database every
+    `reload_seconds`, and sooner when the limit left due schedules unloaded, so memory use does not grow
+    with the number of stored schedules.
+
+    Methods:
+        run_pending(now): Executes every transfer due at `now` and returns how many runs were processed.
+        run_forever(): Executes transfers as they become due until `stop()` is called.
+        stop(): Makes `run_forever()` return.
+    """
+
+    def __init__(self, batch_size=500, reload_seconds=30, max_loaded=50000):
+        """
+        Initializes a new TransferScheduler instance.
+
+        Args:
+            batch_size (int): The maximum number of runs executed in one write transaction.
+            reload_seconds (float): How often the heap is rebuilt. The look-ahead window is twice as long,
+                so a schedule created while running is picked up at most this late.
+            max_loaded (int): The maximum number of schedules held in the heap.
+        """
+        self.__batch_size = batch_size
+        self.__reload_seconds = reload_seconds
+        self.__max_loaded = max_loaded
+        self.__heap = []
+        self.__truncated = False
+        self.__loaded_until = None
+        self.__next_reload = None
+        self.__stop = threading.Event()
+
+    def __reload(self, now):
+        horizon = format_time(now + timedelta(seconds=2 * self.__reload_seconds))
+        with Database.read() as connection:
+            sql = ("SELECT next_run, id FROM ScheduledTransfers WHERE active = 1 AND next_run <= ? "
+                   "ORDER BY next_run LIMIT ?")
+            self.__heap = connection.execute(sql, [horizon, self.__max_loaded]).fetchall()
+        # Rows come back sorted, and a sorted list is already a valid heap.
+        self.__truncated = len(self.__heap) == self.__max_loaded
+        # When the limit cut the window short, schedules after the last loaded one were not read.
+        self.__loaded_until = self.__heap[-1][0] if self.__truncated else horizon
+        self.__next_reload = now + timedelta(seconds=self.__reload_seconds)
+
+    def __pop_due(self, now):
+        due_before = format_time(now)
+        batch = []
+        while self.__heap and self.__heap[0][0] <= due_before and len(batch) < self.__batch_size:
+            batch.append(heapq.heappop(self.__heap))
+        return batch
+
+    def __execute_batch(self, batch):
+        """
+        Executes one batch of runs in a single write transaction.
+
+        Returns:
+            tuple: (processed, follow_ups) where processed is the number of runs executed or refused and
+            follow_ups are the (next_run, id) pairs of schedules that run again.
+        """
+        processed = 0
+        follow_ups = []
+        moment = time.time()
+        reserved = []
+        try:
+            with Database.write() as connection:
+                for next_run, schedule_id in batch:
+                    sql = ("SELECT username, related_username, amount, interval_seconds, remaining "
+                           "FROM ScheduledTransfers WHERE id = ? AND active = 1 AND next_run = ?")
+                    row = connection.execute(sql, [schedule_id, next_run]).fetchone()
+                    if row is None:
+                        # Cancelled, or this run was already executed.
+                        continue
+                    username, dest_username, amount, interval_seconds, remaining = row
+                    reason = LimitsService.reserve(username, "transfer", amount, moment)
+                    if reason is None:
+                        reason = AccountService._transfer_in_transaction(connection, username, amount, dest_username)
+                        if reason is None:
+                            reserved.append((username, amount))
+                        else:
+                            LimitsService.release(username, "transfer", amount, moment)
+
+                    remaining = None if remaining is None else remaining - 1
+                    if interval_seconds > 0 and (remaining is None or remaining > 0):
+                        following = format_time(
+                            datetime.fromisoformat(next_run) + timedelta(seconds=interval_seconds)
+                        )
+                        active = 1
+                        follow_ups.append((following, schedule_id))
+                    else:
+                        following = next_run
+                        active = 0
+                    sql = ("UPDATE ScheduledTransfers SET next_run = ?, remaining = ?, active = ?, last_status = ? "
+                           "WHERE id = ?")
+                    connection.execute(sql, [following, remaining, active, reason or "ok", schedule_id])
+                    processed += 1
+        except BaseException:
+            # The transfers were rolled back, so they must not use up the allowance either.
+            for username, amount in reserved:
+                LimitsService.release(username, "transfer", amount, moment)
+            raise
+        return processed, follow_ups
+
+    def run_pending(self, now=None):
+        """
+        Executes every transfer due at `now`, including runs missed while no scheduler was running.
+
+        Args:
+            now (datetime): The current time; defaults to datetime.now().
+
+        Returns:
+            int: The number of runs processed, whether the transfer was made or refused.
+        """
+        now = now or datetime.now()
+        if self.__next_reload is None or now >= self.__next_reload:
+            self.__reload(now)
+        processed = 0
+        while True:
+            batch = self.__pop_due(now)
+            if not batch:
+                if self.__truncated and self.__loaded_until <= format_time(now):
+                    self.__reload(now)
+                    continue
+                return processed
+            batch_processed, follow_ups = self.__execute_batch(batch)
+            processed += batch_processed
+            horizon = format_time(self.__next_reload + timedelta(seconds=self.__reload_seconds))
+            for item in follow_ups:
+                if item[0] <= horizon:
+                    heapq.heappush(self.__heap, item)
+
+    def run_forever(self):
+        """
+        Executes transfers as they become due until `stop()` is called. Between runs the thread sleeps
+        until the earliest loaded schedule is due or the heap has to be reloaded.
+
+        Returns:
+            None
+        """
+        self.__stop.clear()
+        while not self.__stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"Error: {e}")
+            wake_up = self.__next_reload or datetime.now() + timedelta(seconds=self.__reload_seconds)
+            if self.__heap:
+                wake_up = min(wake_up, datetime.fromisoformat(self.__heap[0][0]))
+            self.__stop.wait(max(0.0, (wake_up - datetime.now()).total_seconds()))
+
+    def stop(self):
+        """
+        Makes `run_forever()` return.
+
+        Returns:
+            None
+        """
+        self.__stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Execute scheduled transfers as they become due.")
+    parser.add_argument("--database", default=None, help="path of the database file")
+    parser.add_argument("--batch-size", type=int, default=500, help="runs executed per write transaction")
+    args = parser.parse_args()
+    if args.database is not None:
+        Database.configure(path=args.database)
+    try:
+        TransferScheduler(batch_size=args.batch_size).run_forever()
+    except KeyboardInterrupt:
+        pass
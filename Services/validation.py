@@ -2,10 +2,10 @@
 validate.py
 
 This module provides static methods for validating user input, including usernames and passwords.
-It uses helper methods from the string_helper module for password strength checks.
+The rules themselves live in the default policy of the credential_policy module.
 """
 
-from Services.string_helper import Helper
+from Services.credential_policy import DEFAULT_POLICY
 
 class Validate:
     """
@@ -26,9 +26,7 @@ class Validate:
         Returns:
             bool: True if the username is valid, False otherwise.
         """
-        if len(username) >= 3 and 'A' <= username[0] <= 'Z':
-            return True
-        return False
+        return DEFAULT_POLICY.is_valid_username(username)
 
     @staticmethod
     def validate_password(password):
@@ -40,7 +38,7 @@ class Validate:
         - Must contain at least one numeric digit
         - Must contain at least one special character ($, @, &, -)
 
-        This method uses the Helper class from string_helper to perform these checks.
+        The checks are made in a single pass by `credential_policy.DEFAULT_POLICY`.
 
         Args:
             password (str): The password to validate.
@@ -48,12 +46,4 @@ class Validate:
         Returns:
             bool: True if the password meets all criteria, False otherwise.
         """
-        if (
-            len(password) >= 6 and
-            Helper.contain_lower_case(password) and
-            Helper.contain_upper_case(password) and
-            Helper.contain_number(password) and
-            Helper.contain_special(password)
-        ):
-            return True
-        return False
+        return DEFAULT_POLICY.is_valid_password(password)
@@ -19,16 +19,27 @@ Usage:
     This script is intended to be run from the command line. It will display the ASCII art "INSTAPAY" logo and 
     then start the application by invoking the `start` method in the `Main` class.
 
+    With `--profile [PATH]` the session runs under `Services.profiler.Profiler`. On exit the cProfile stats are
+    written to PATH (default "ewallet.prof"), a readable summary of the menu actions, SQLite statements and hot
+    spots is written to PATH.txt and printed. Without the flag the profiler is not even imported.
+
 Example:
     python main.py
+    python main.py --profile session.prof
 """
 
+import argparse
+
 from Services.application import Main
 import termcolor
 import pyfiglet
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="INSTAPAY electronic wallet")
+    parser.add_argument("--profile", nargs="?", const="ewallet.prof", default=None, metavar="PATH",
+                        help="profile the session and write the pstats file to PATH")
+    args = parser.parse_args()
     # Display the "INSTAPAY" logo in ASCII art with yellow color
     print(termcolor.colored(pyfiglet.figlet_format("INSTAPAY"), "yellow"))
     print("hello from branch 2")
@@ -36,4 +47,12 @@ if __name__ == "__main__":
     print("hiiii2")
     print("xxxxx")
     # Start the application
-    Main.start()
+    if args.profile is None:
+        Main.start()
+    else:
+        from Services.profiler import Profiler
+        Profiler.start()
+        try:
+            Main.start()
+        finally:
+            print(Profiler.stop(args.profile))